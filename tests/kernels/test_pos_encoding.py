@@ -1,10 +1,12 @@
 from itertools import accumulate, product
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
 import pytest
 import torch
 
-from vllm.model_executor.layers.rotary_embedding import get_rope
+from vllm.model_executor.layers.rotary_embedding import (
+    DeepseekScalingRotaryEmbedding, Phi3LongRoPEScaledRotaryEmbedding,
+    RotaryEmbedding, get_rope)
 
 from .allclose_default import get_default_atol, get_default_rtol
 
@@ -246,3 +248,152 @@ def test_rope_module_cache():
                         is_neox_stype, rope_scaling, dtype)
         # check if cache take effect
         assert id(rope) == rope_setting_id_map[str(setting)]
+
+
+def _ref_rotate_neox(x: torch.Tensor) -> torch.Tensor:
+    x1 = x[..., :x.shape[-1] // 2]
+    x2 = x[..., x.shape[-1] // 2:]
+    return torch.cat((-x2, x1), dim=-1)
+
+
+def _ref_rotate_gptj(x: torch.Tensor) -> torch.Tensor:
+    x1 = x[..., ::2]
+    x2 = x[..., 1::2]
+    return torch.stack((-x2, x1), dim=-1).flatten(-2)
+
+
+def _ref_apply_rope(x: torch.Tensor, cos_sin: torch.Tensor, rotary_dim: int,
+                    is_neox_style: bool) -> torch.Tensor:
+    """x * cos + rotate(x) * sin with the tables duplicated to rotary_dim.
+
+    `x` has shape [..., num_heads, head_size].
+    """
+    cos, sin = cos_sin.chunk(2, dim=-1)
+    if is_neox_style:
+        cos = torch.cat((cos, cos), dim=-1).unsqueeze(-2)
+        sin = torch.cat((sin, sin), dim=-1).unsqueeze(-2)
+        rotate_fn = _ref_rotate_neox
+    else:
+        cos = cos.repeat_interleave(2, dim=-1).unsqueeze(-2)
+        sin = sin.repeat_interleave(2, dim=-1).unsqueeze(-2)
+        rotate_fn = _ref_rotate_gptj
+
+    x_rot = x[..., :rotary_dim]
+    x_rot = x_rot * cos + rotate_fn(x_rot) * sin
+    return torch.cat((x_rot, x[..., rotary_dim:]), dim=-1)
+
+
+NATIVE_POSITION_SHAPES = [(11, ), (3, 11)]
+
+
+@pytest.mark.parametrize("is_neox_style", IS_NEOX_STYLE)
+@pytest.mark.parametrize("rotary_dim", ROTARY_DIMS)
+@pytest.mark.parametrize("positions_shape", NATIVE_POSITION_SHAPES)
+@torch.inference_mode()
+def test_rotary_embedding_forward_native(
+    is_neox_style: bool,
+    rotary_dim: Optional[int],
+    positions_shape: Tuple[int, ...],
+    head_size: int = 64,
+    num_heads: int = 4,
+    max_position: int = 128,
+    base: int = 10000,
+) -> None:
+    torch.random.manual_seed(0)
+    torch.set_default_device("cpu")
+    if rotary_dim is None:
+        rotary_dim = head_size
+    rope = RotaryEmbedding(head_size, rotary_dim, max_position, base,
+                           is_neox_style, torch.float)
+
+    positions = torch.randint(0, max_position, positions_shape)
+    query = torch.randn(*positions_shape, num_heads * head_size)
+    key = torch.randn_like(query)
+
+    out_query, out_key = rope.forward_native(positions, query, key)
+
+    cos_sin = rope.cos_sin_cache[positions]
+    for out, x in [(out_query, query), (out_key, key)]:
+        ref = _ref_apply_rope(x.view(*positions_shape, num_heads, head_size),
+                              cos_sin, rotary_dim, is_neox_style)
+        assert out.shape == x.shape
+        torch.testing.assert_close(out, ref.flatten(-2))
+
+
+@pytest.mark.parametrize("is_neox_style", IS_NEOX_STYLE)
+@pytest.mark.parametrize("rotary_dim", ROTARY_DIMS)
+@pytest.mark.parametrize("positions_shape", NATIVE_POSITION_SHAPES)
+@torch.inference_mode()
+def test_deepseek_rotary_embedding_native(
+    monkeypatch: pytest.MonkeyPatch,
+    is_neox_style: bool,
+    rotary_dim: Optional[int],
+    positions_shape: Tuple[int, ...],
+    head_size: int = 64,
+    num_heads: int = 4,
+    max_position: int = 128,
+    base: int = 10000,
+) -> None:
+    torch.random.manual_seed(0)
+    torch.set_default_device("cpu")
+    if rotary_dim is None:
+        rotary_dim = head_size
+    # The YaRN cache is built on CUDA; only the rotation is under test here,
+    # so build a plain cache on CPU instead.
+    monkeypatch.setattr(DeepseekScalingRotaryEmbedding, "_compute_inv_freq",
+                        RotaryEmbedding._compute_inv_freq)
+    monkeypatch.setattr(DeepseekScalingRotaryEmbedding,
+                        "_compute_cos_sin_cache",
+                        RotaryEmbedding._compute_cos_sin_cache)
+    rope = DeepseekScalingRotaryEmbedding(head_size, rotary_dim, max_position,
+                                          base, is_neox_style, 1.0,
+                                          torch.float)
+
+    positions = torch.randint(0, max_position, positions_shape)
+    query = torch.randn(*positions_shape, num_heads, head_size)
+    key = torch.randn_like(query)
+
+    out_query, out_key = rope.forward(positions, query, key)
+
+    cos_sin = rope.cos_sin_cache[positions]
+    for out, x in [(out_query, query), (out_key, key)]:
+        ref = _ref_apply_rope(x, cos_sin, rotary_dim, is_neox_style)
+        torch.testing.assert_close(out, ref)
+
+
+@torch.inference_mode()
+def test_phi3_long_rope_scaled_rotary_embedding(
+    head_size: int = 64,
+    num_heads: int = 4,
+    num_tokens: int = 11,
+    max_position: int = 256,
+    original_max_position: int = 64,
+    base: int = 10000,
+) -> None:
+    torch.random.manual_seed(0)
+    torch.set_default_device("cpu")
+    factors = [1.0 + i / head_size for i in range(head_size // 2)]
+    rope = Phi3LongRoPEScaledRotaryEmbedding(head_size, head_size,
+                                             max_position,
+                                             original_max_position, base, True,
+                                             torch.float, factors,
+                                             factors[::-1])
+
+    # Both below and above the original context length, so that the short
+    # and the long cache are both exercised.
+    for max_pos in [original_max_position, max_position]:
+        positions = torch.randint(0, max_pos, (num_tokens, ))
+        query = torch.randn(num_tokens, num_heads * head_size)
+        key = torch.randn_like(query)
+
+        out_query, out_key = rope(positions, query, key)
+
+        idx = positions
+        if torch.any(positions > original_max_position):
+            idx = positions + original_max_position
+        cos_sin = rope.long_short_cos_sin_cache[idx]
+        for out, x in [(out_query, query), (out_key, key)]:
+            ref = _ref_apply_rope(x.view(num_tokens, num_heads, head_size),
+                                  cos_sin, head_size, True)
+            assert out.shape == x.shape
+            torch.testing.assert_close(out, ref.flatten(-2))
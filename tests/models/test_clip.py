@@ -0,0 +1,49 @@
+import torch
+from transformers import CLIPVisionConfig
+from transformers.models.clip import modeling_clip as hf_clip
+
+from vllm.model_executor.models.clip import CLIPAttention, CLIPVisionEmbeddings
+
+
+def test_clip_vision_embeddings_match_conv():
+    torch.manual_seed(0)
+    config = CLIPVisionConfig(hidden_size=32,
+                              image_size=28,
+                              patch_size=7,
+                              num_channels=3)
+    embeddings = CLIPVisionEmbeddings(config)
+    torch.nn.init.normal_(embeddings.patch_embedding.weight)
+
+    pixel_values = torch.randn(2, config.num_channels, config.image_size,
+                               config.image_size)
+
+    patch_embeds = embeddings.patch_embedding(pixel_values) \
+        .flatten(2).transpose(1, 2)
+    class_embeds = embeddings.class_embedding.expand(2, 1, -1)
+    expected = torch.cat([class_embeds, patch_embeds], dim=1) \
+        + embeddings.position_embedding(embeddings.position_ids)
+
+    with torch.no_grad():
+        actual = embeddings(pixel_values)
+
+    assert actual.shape == (2, embeddings.num_positions, config.hidden_size)
+    torch.testing.assert_close(actual, expected.detach())
+
+
+def test_clip_attention_matches_hf():
+    torch.manual_seed(0)
+    config = CLIPVisionConfig(hidden_size=32,
+                              num_attention_heads=4,
+                              attention_dropout=0.0)
+    hf_attn = hf_clip.CLIPAttention(config).eval()
+    attn = CLIPAttention(config).eval()
+
+    # The checkpoint weights must load into the in-tree module as-is
+    attn.load_state_dict(hf_attn.state_dict())
+
+    hidden_states = torch.randn(2, 10, config.hidden_size)
+    with torch.no_grad():
+        expected = hf_attn(hidden_states)[0]
+        actual = attn(hidden_states)
+
+    torch.testing.assert_close(actual, expected)
@@ -0,0 +1,46 @@
+import pytest
+import torch
+
+from vllm.model_executor.models.llava import merge_vision_embeddings
+
+IMAGE_TOKEN_ID = 32000
+HIDDEN_SIZE = 8
+
+
+def _make_inputs(num_images: int, image_feature_size: int):
+    text_ids = torch.randint(0, 100, (5, ))
+    image_ids = torch.full((image_feature_size, ), IMAGE_TOKEN_ID)
+    input_ids = torch.cat([text_ids] +
+                          [torch.cat([image_ids, text_ids])] * num_images)
+    inputs_embeds = torch.randn(input_ids.shape[0], HIDDEN_SIZE)
+    vision_embeddings = torch.randn(num_images, image_feature_size,
+                                    HIDDEN_SIZE)
+    return input_ids, inputs_embeds, vision_embeddings
+
+
+@pytest.mark.parametrize("num_images", [1, 3])
+@pytest.mark.parametrize("dtype", [torch.float32, torch.float16])
+def test_merge_vision_embeddings(num_images: int, dtype: torch.dtype):
+    torch.manual_seed(0)
+    input_ids, inputs_embeds, vision_embeddings = _make_inputs(num_images, 4)
+    inputs_embeds = inputs_embeds.to(dtype)
+
+    expected = inputs_embeds.clone()
+    expected[input_ids == IMAGE_TOKEN_ID] = vision_embeddings.view(
+        -1, HIDDEN_SIZE).to(dtype)
+
+    actual = merge_vision_embeddings(input_ids, inputs_embeds,
+                                     vision_embeddings, IMAGE_TOKEN_ID)
+
+    # The merge happens in place
+    assert actual is inputs_embeds
+    assert actual.dtype == dtype
+    torch.testing.assert_close(actual, expected, rtol=0, atol=0)
+
+
+def test_merge_vision_embeddings_size_mismatch():
+    input_ids, inputs_embeds, vision_embeddings = _make_inputs(2, 4)
+
+    with pytest.raises(ValueError, match="image_feature_size should be 4"):
+        merge_vision_embeddings(input_ids, inputs_embeds,
+                                vision_embeddings[:1, :], IMAGE_TOKEN_ID)
@@ -4,9 +4,9 @@ from typing import Optional
 
 import torch
 import torch.nn as nn
+import torch.nn.functional as F
 from PIL import Image
 from transformers import CLIPVisionConfig
-from transformers.models.clip.modeling_clip import CLIPAttention
 
 from vllm.model_executor.layers.activation import get_act_fn
 from vllm.model_executor.layers.linear import (ColumnParallelLinear,
@@ -100,6 +100,8 @@ class CLIPVisionEmbeddings(nn.Module):
             bias=False,
         )
 
+        self.grid_length = get_clip_patch_grid_length(
+            image_size=self.image_size, patch_size=self.patch_size)
         self.num_patches = get_clip_num_patches(image_size=self.image_size,
                                                 patch_size=self.patch_size)
         self.num_positions = self.num_patches + 1
@@ -111,10 +113,18 @@ class CLIPVisionEmbeddings(nn.Module):
 
     def forward(self, pixel_values: torch.Tensor) -> torch.Tensor:
         batch_size = pixel_values.shape[0]
-        target_dtype = self.patch_embedding.weight.dtype
-        patch_embeds = self.patch_embedding(pixel_values.to(
-            dtype=target_dtype))  # shape = [*, width, grid, grid]
-        patch_embeds = patch_embeds.flatten(2).transpose(1, 2)
+        patch_weight = self.patch_embedding.weight
+
+        # Since the kernel size equals the stride, the convolution is just a
+        # linear projection of each non-overlapping patch. Unfolding the
+        # patches ourselves lets it run as a single GEMM instead.
+        # [*, c, grid * p, grid * p] -> [*, grid * grid, c * p * p]
+        grid, p = self.grid_length, self.patch_size
+        patches = pixel_values.to(dtype=patch_weight.dtype) \
+            .reshape(batch_size, self.config.num_channels, grid, p, grid, p) \
+            .permute(0, 2, 4, 1, 3, 5) \
+            .reshape(batch_size, grid * grid, -1)
+        patch_embeds = F.linear(patches, patch_weight.view(self.embed_dim, -1))
 
         class_embeds = self.class_embedding.expand(batch_size, 1, -1)
         embeddings = torch.cat([class_embeds, patch_embeds], dim=1)
@@ -123,6 +133,58 @@ class CLIPVisionEmbeddings(nn.Module):
         return embeddings
 
 
+# Adapted from https://github.com/huggingface/transformers/blob/v4.39.0/src/transformers/models/clip/modeling_clip.py#L241 # noqa
+class CLIPAttention(nn.Module):
+    """Multi-headed attention over the image patches.
+
+    Unlike the HuggingFace implementation, the attention weights are never
+    materialized: the vision encoder attends over all patches without a mask,
+    so we can hand the whole computation to
+    :func:`torch.nn.functional.scaled_dot_product_attention`, which dispatches
+    to a fused (flash / memory-efficient) kernel when available.
+    """
+
+    def __init__(self, config: CLIPVisionConfig):
+        super().__init__()
+        self.config = config
+        self.embed_dim = config.hidden_size
+        self.num_heads = config.num_attention_heads
+        self.head_dim = self.embed_dim // self.num_heads
+        if self.head_dim * self.num_heads != self.embed_dim:
+            raise ValueError(
+                "embed_dim must be divisible by num_heads "
+                f"(got `embed_dim`: {self.embed_dim} and `num_heads`:"
+                f" {self.num_heads}).")
+        self.scale = self.head_dim**-0.5
+
+        self.k_proj = nn.Linear(self.embed_dim, self.embed_dim)
+        self.v_proj = nn.Linear(self.embed_dim, self.embed_dim)
+        self.q_proj = nn.Linear(self.embed_dim, self.embed_dim)
+        self.out_proj = nn.Linear(self.embed_dim, self.embed_dim)
+
+    def forward(self, hidden_states: torch.Tensor) -> torch.Tensor:
+        bsz, tgt_len, _ = hidden_states.size()
+
+        # [b, s, h * d] -> [b, h, s, d]
+        query_states = self.q_proj(hidden_states) \
+            .view(bsz, tgt_len, self.num_heads, self.head_dim).transpose(1, 2)
+        key_states = self.k_proj(hidden_states) \
+            .view(bsz, tgt_len, self.num_heads, self.head_dim).transpose(1, 2)
+        value_states = self.v_proj(hidden_states) \
+            .view(bsz, tgt_len, self.num_heads, self.head_dim).transpose(1, 2)
+
+        attn_output = F.scaled_dot_product_attention(query_states,
+                                                     key_states,
+                                                     value_states,
+                                                     scale=self.scale)
+
+        # [b, h, s, d] -> [b, s, h * d]
+        attn_output = attn_output.transpose(1, 2) \
+            .reshape(bsz, tgt_len, self.embed_dim)
+
+        return self.out_proj(attn_output)
+
+
 class CLIPMLP(nn.Module):
 
     def __init__(self,
@@ -167,7 +229,7 @@ class CLIPEncoderLayer(nn.Module):
         residual = hidden_states
 
         hidden_states = self.layer_norm1(hidden_states)
-        hidden_states, _ = self.self_attn(hidden_states=hidden_states)
+        hidden_states = self.self_attn(hidden_states=hidden_states)
         hidden_states = residual + hidden_states
 
         residual = hidden_states
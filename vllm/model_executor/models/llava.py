@@ -57,15 +57,19 @@ def merge_vision_embeddings(input_ids: torch.Tensor,
                             vision_embeddings: torch.Tensor,
                             image_token_id: int) -> torch.Tensor:
     """In place merges in vision_embeddings with inputs_embeds."""
-    mask = (input_ids == image_token_id)
+    image_positions = torch.nonzero(input_ids.view(-1) == image_token_id)
+    image_positions = image_positions.squeeze(-1)
 
     image_feature_size = vision_embeddings.shape[0] * vision_embeddings.shape[1]
-    if mask.sum() != image_feature_size:
+    if image_positions.shape[0] != image_feature_size:
         raise ValueError(f"image_feature_size should be {image_feature_size}, "
-                         f"but found: {mask.sum()}")
+                         f"but found: {image_positions.shape[0]}")
 
-    inputs_embeds[mask] = vision_embeddings.view(image_feature_size,
-                                                 vision_embeddings.shape[-1])
+    hidden_size = inputs_embeds.shape[-1]
+    inputs_embeds.view(-1, hidden_size).index_copy_(
+        0, image_positions,
+        vision_embeddings.view(image_feature_size,
+                               hidden_size).to(inputs_embeds.dtype))
 
     return inputs_embeds
 
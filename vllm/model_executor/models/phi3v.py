@@ -13,6 +13,7 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+from functools import lru_cache
 from typing import Dict, Iterable, List, Literal, Optional, Tuple, TypedDict
 
 import numpy as np
@@ -159,7 +160,7 @@ class Phi3HDImageEmbedding(Phi3ImageEmbeddingBase):
 
         target_dtype = self.img_projection[0].bias.dtype
 
-        if len(positions.tolist()) > 0:
+        if positions.numel() > 0:
             # if self.use_hd_transform and img_sizes:
             # img_embeds: (num_images, max_num_crops, 3, H, W)
             # img_sizes: (num_images, 2).view(1, -1)
@@ -179,8 +180,11 @@ class Phi3HDImageEmbedding(Phi3ImageEmbeddingBase):
             output_imgs = []
             output_len = []
 
+            # num_images x [h, w]
+            img_sizes_list = img_sizes.tolist()
+
             for _bs in range(bs):
-                h, w = img_sizes[_bs]
+                h, w = img_sizes_list[_bs]
                 h = h // 336
                 w = w // 336
                 B_ = h * w
@@ -227,11 +231,9 @@ class Phi3HDImageEmbedding(Phi3ImageEmbeddingBase):
                 output_len.append(temp_len)
 
             num_img_tokens = output_len
-            img_set_tensor = []
-            for _output_img in output_imgs:
-                img_feature_proj = self.img_projection(
-                    _output_img.to(target_dtype))
-                img_set_tensor.append(img_feature_proj)
+            img_set_tensor = self.img_projection(
+                torch.cat(output_imgs, dim=1).to(target_dtype)).split(
+                    [img.shape[1] for img in output_imgs], dim=1)
             select = True
 
         input_ids.clamp_min_(0).clamp_max_(self.vocab_size)
@@ -239,13 +241,12 @@ class Phi3HDImageEmbedding(Phi3ImageEmbeddingBase):
         hidden_states = self.wte(input_ids)
 
         if select:
-            idx = 0
-            for i, cnt in enumerate(num_img_tokens):
-                hidden_states[positions[idx, 0],
-                              positions[idx, 1]:positions[idx, 1] +
-                              cnt] = (img_set_tensor[i].to(
-                                  hidden_states.dtype))
-                idx += cnt
+            start_idxs = np.cumsum([0] + num_img_tokens[:-1]).tolist()
+            img_starts = positions[start_idxs].tolist()
+            for (row, col), cnt, img_feature in zip(img_starts, num_img_tokens,
+                                                    img_set_tensor):
+                hidden_states[row, col:col + cnt] = (img_feature.to(
+                    hidden_states.dtype))
 
         return hidden_states.squeeze(0)
 
@@ -306,6 +307,7 @@ def _calc_padded_size(*, width: int, height: int, padding_unit: int = 336):
 
 
 # Based on https://huggingface.co/microsoft/Phi-3-vision-128k-instruct/blob/main/image_processing_phi3_v.py
+@lru_cache
 def _calc_hd_transform_size(*, width: int, height: int, hd_num: int = 16):
     transposed = False
     if width < height: